@@ -11,11 +11,9 @@ functions in modules and we only want script code in the file __main__.py
 Author: Jesus Salgado
 Date: 6/24/2025
 """
-import utils
 import os.path
-import violations
-import endorsements
-import inspections
+import csv
+import scan
 from tests import test_all
 
 
@@ -23,11 +21,12 @@ def discover_violations(directory,output):
     """
     Searches the dataset directory for any flight lessons the violation regulations.
     
-    This function will call list_weather_violations() to get the list of weather violations.
-    If list_endorsment_violations (optional) is completed, it will call that too, as
-    well as list_inspection_violations.  It will concatenate all of these 2d lists
-    into a single 2d list of violations (so a flight may be listed more than once for
-    each of the three types of violations).
+    This function calls scan.scan_all() to check the lessons for weather violations,
+    inspection violations, and (if that audit is completed) endorsement violations, all
+    in a single pass over the lessons.  The violations are grouped by lesson, in the
+    order of lessons.csv.  A flight may be listed more than once, once for each of the
+    three types of violations, and those come in the order weather, inspection, and
+    then endorsement.
     
     If the parameter output is not None, it will create the CSV file with name output
     and write the 2d list of violations to this file.  This CSV file should have the
@@ -52,25 +51,31 @@ def discover_violations(directory,output):
     Parameter output: The CSV file to store the results
     Precondition: output is None or a string that is a valid file name
     """
-    # Gather all violations
-    all_violations = []
-    all_violations += violations.list_weather_violations(directory)
-    # Always include inspection violations
-    all_violations += inspections.list_inspection_violations(directory)
-    # Optionally include endorsement violations if implemented
-    if hasattr(endorsements, 'list_endorsement_violations'):
-        all_violations += endorsements.list_endorsement_violations(directory)
+    # Load every file first, so that a bad dataset fails before the output is touched.
+    # The violations are then found lazily, in one pass over the lessons.  The
+    # endorsement audit is included only if implemented.
+    found = scan.scan_all(directory)
 
-    # Write to CSV if output is specified
-    if output is not None:
+    if output is None:
+        # Only the count is needed, so do not keep the violations around
+        count = sum(1 for _ in found)
+    else:
+        # Write to CSV if output is specified, one violation at a time as they are found
+        # (the violations are rows of strings, so there is nothing to convert)
         header = ['STUDENT', 'AIRPLANE', 'INSTRUCTOR', 'TAKEOFF', 'LANDING', 'FILED', 'AREA', 'REASON']
-        utils.write_csv([header] + all_violations, output)
+        count = 0
+        with open(output, 'w', newline='', encoding='utf-8') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(header)
+            for row in found:
+                writer.writerow(row)
+                count += 1
 
     # Print the number of violations
-    if len(all_violations) == 1:
+    if count == 1:
         print("1 violation found.")
-    elif len(all_violations) > 1:
-        print(f"{len(all_violations)} violations found.")
+    elif count > 1:
+        print(f"{count} violations found.")
     else:
         print("No violations found.")
 
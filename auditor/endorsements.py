@@ -45,6 +45,25 @@ import os.path
 import datetime
 
 
+# The Yes/No and VFR/IFR columns of the instructor and plane tables, once normalized
+NORMALIZED = frozenset(('YES', 'NO', 'VFR', 'IFR'))
+
+
+def normalize(flag):
+    """
+    Returns the Yes/No or VFR/IFR value flag stripped of whitespace and in upper case.
+    
+    The CSV files are not consistent about case or spacing.  Values that are already
+    normalized are returned as is, so tables normalized once when they are loaded
+    (see list_endorsement_violations) do not pay for strip() and upper() on every
+    check.
+    
+    Parameter flag: The value to normalize
+    Precondition: flag is a string
+    """
+    return flag if flag in NORMALIZED else flag.strip().upper()
+
+
 def teaches_multiengine(instructor):
     """
     Returns True if this instructor can teach a student on a multiengine flight.
@@ -53,7 +72,7 @@ def teaches_multiengine(instructor):
     Parameter instructor: The flight instructor
     Precondition: instructor is a 6-element list of strings representing an instructor
     """
-    return instructor[5].strip().upper() == 'YES'
+    return normalize(instructor[5]) == 'YES'
 
 
 def teaches_instrument(instructor):
@@ -64,7 +83,7 @@ def teaches_instrument(instructor):
     Parameter instructor: The flight instructor
     Precondition: instructor is a 6-element list of strings representing an instructor
     """
-    return instructor[4].strip().upper() == 'YES'
+    return normalize(instructor[4]) == 'YES'
 
 
 def is_advanced(plane):
@@ -74,7 +93,7 @@ def is_advanced(plane):
     Parameter plane: The school airplane
     Precondition: plane is a 7-element list of strings representing an airplane
     """
-    return plane[3].strip().upper() == 'YES'
+    return normalize(plane[3]) == 'YES'
 
 
 def is_multiengine(plane):
@@ -84,7 +103,7 @@ def is_multiengine(plane):
     Parameter plane: The school airplane
     Precondition: plane is a 7-element list of strings representing an airplane
     """
-    return plane[4].strip().upper() == 'YES'
+    return normalize(plane[4]) == 'YES'
 
 
 def is_ifr_capable(plane):
@@ -97,7 +116,7 @@ def is_ifr_capable(plane):
     Parameter plane: The school airplane
     Precondition: plane is a 7-element list of strings representing an airplane
     """
-    return plane[2].strip().upper() == 'IFR'
+    return normalize(plane[2]) == 'IFR'
 
 
 def bad_endorsement(takeoff, student, instructor, plane):
@@ -119,13 +138,14 @@ def bad_endorsement(takeoff, student, instructor, plane):
     Precondition: student is 10-element list of strings representing a pilot
     
     Parameter instructor: The flight instructor
-    Precondition: instructor is a 6-element list of strings representing an instructor
+    Precondition: instructor is a 6-element list of strings representing an instructor,
+    or None if there is no instructor
     
     Parameter plane: The school airplane
     Precondition: plane is a 7-element list of strings representing an airplane
     """
     # If there is an instructor
-    if instructor is not None and instructor != []:
+    if instructor is not None:
         # Only a problem if the plane is multiengine and instructor does not have MEI
         if is_multiengine(plane) and not teaches_multiengine(instructor):
             return True
@@ -159,14 +179,15 @@ def bad_ifr(takeoff, student, instructor, plane):
     Precondition: student is 10-element list of strings representing a pilot
     
     Parameter instructor: The flight instructor
-    Precondition: instructor is a 6-element list of strings representing an instructor
+    Precondition: instructor is a 6-element list of strings representing an instructor,
+    or None if there is no instructor
     
     Parameter plane: The school airplane
     Precondition: plane is a 7-element list of strings representing an airplane
     """
     if not is_ifr_capable(plane):
         return True
-    if instructor is not None and instructor != []:
+    if instructor is not None:
         # Instructor must have CFII
         if not teaches_instrument(instructor):
             return True
@@ -229,42 +250,88 @@ def list_endorsement_violations(directory):
     'lessons.csv'
     """
     # Load all data
-    lessons = utils.read_csv(os.path.join(directory, LESSONS))
+    lessons = list(utils.read_rows(os.path.join(directory, LESSONS)))  # skip header
     students = utils.read_csv(os.path.join(directory, STUDENTS))
     instructors = utils.read_csv(os.path.join(directory, TEACHERS))
     planes = utils.read_csv(os.path.join(directory, PLANES))
 
-    # Build lookup dictionaries
-    student_dict = {s[0]: s for s in students}
-    instructor_dict = {i[0]: i for i in instructors}
-    plane_dict = {p[0]: p for p in planes}
+    result = []
+    for lesson, annotation in zip(lessons, scan_endorsements(lessons, students, instructors, planes), strict=True):
+        if annotation:
+            result.append([*lesson, annotation])
+    return result
+
 
-    violations = []
-    for lesson in lessons:
+def scan_endorsements(lessons, students, instructors, planes):
+    """
+    Yields the endorsement violation for each lesson, in order.
+    
+    This function is the loop at the heart of list_endorsement_violations, separated
+    from the file loading so that scan.scan_all can share the loaded files with the
+    other audits.  For each lesson it yields 'Solo', 'Endorsement', 'IFR', or
+    'Credentials' as described in list_endorsement_violations, or the empty string
+    if the lesson is fine (or cannot be checked, such as a lesson with an unknown
+    student or plane).  So it yields exactly one string per lesson.
+    
+    Parameter lessons: The lessons to check
+    Precondition: lessons is a 2d list of lessons (from lessons.csv) WITHOUT the header
+    
+    Parameter students: The table of students
+    Precondition: students is the 2d list read from students.csv (with header)
+    
+    Parameter instructors: The table of instructors
+    Precondition: instructors is the 2d list read from instructors.csv (with header)
+    
+    Parameter planes: The table of planes
+    Precondition: planes is the 2d list read from fleet.csv (with header)
+    """
+    # Build lookup dictionaries, normalizing the Yes/No and VFR/IFR columns once
+    # (on copies, as the tables may be shared) instead of once per lesson
+    student_dict = utils.build_index(students)
+    instructor_dict = {}
+    for inst in instructors:
+        inst = inst[:]
+        inst[4] = normalize(inst[4])
+        inst[5] = normalize(inst[5])
+        instructor_dict[inst[0]] = inst
+    plane_dict = {}
+    for plane in planes:
+        plane = plane[:]
+        plane[2] = normalize(plane[2])
+        plane[3] = normalize(plane[3])
+        plane[4] = normalize(plane[4])
+        plane_dict[plane[0]] = plane
+
+    # Most flights are VFR, so find the IFR ones (and IFR planes) up front
+    filed_ifr = [len(lesson) > 5 and normalize(lesson[5]) == 'IFR' for lesson in lessons]
+    instructor_ids = [lesson[2].strip() if len(lesson) > 2 else '' for lesson in lessons]
+    ifr_capable = {tail: is_ifr_capable(plane) for tail, plane in plane_dict.items()}
+
+    for lesson, is_ifr, instructor_id in zip(lessons, filed_ifr, instructor_ids):
         student_id = lesson[0]
         plane_id = lesson[1]
-        instructor_id = lesson[2].strip() if len(lesson) > 2 else ''
         takeoff = utils.str_to_time(lesson[3])
         # Get objects
         student = student_dict.get(student_id)
-        instructor = instructor_dict.get(instructor_id) if instructor_id else []
+        instructor = instructor_dict.get(instructor_id) if instructor_id else None
         plane = plane_dict.get(plane_id)
         # Skip if any required entity is missing
         if student is None or plane is None:
+            yield ''
             continue
         # Check violations
         solo = False
         endorsement = False
         ifr = False
         # (1) Solo violation: student has not soloed but flies without instructor
-        # Use get_certification directly
-        if instructor == [] and pilots.get_certification(takeoff, student) < pilots.PILOT_STUDENT:
+        # Use get_certification directly (an unknown instructor id still counts as one)
+        if not instructor_id and pilots.get_certification(takeoff, student) < pilots.PILOT_STUDENT:
             solo = True
         # (2) Endorsement violation
         if bad_endorsement(takeoff, student, instructor, plane):
             endorsement = True
-        # (3) IFR violation
-        if lesson[5].strip().upper() == 'IFR' and bad_ifr(takeoff, student, instructor, plane):
+        # (3) IFR violation (bad_ifr is only needed if the plane itself is capable)
+        if is_ifr and (not ifr_capable[plane_id] or bad_ifr(takeoff, student, instructor, plane)):
             ifr = True
         # Annotate
         if solo and (endorsement or ifr):
@@ -276,6 +343,6 @@ def list_endorsement_violations(directory):
         elif ifr:
             annotation = 'IFR'
         else:
-            continue  # No violation
-        violations.append(lesson + [annotation])
-    return violations
\ No newline at end of file
+            annotation = ''  # No violation
+        yield annotation
+
@@ -52,6 +52,11 @@ Date: 6/28/2025
 """
 import os.path
 import datetime
+import bisect
+import operator
+import functools
+import itertools
+import collections
 import utils
 
 # FILENAMES
@@ -64,6 +69,108 @@ PLANES   = 'fleet.csv'
 # The list of all repairs made to planes over the past year
 REPAIRS  = 'repairs.csv'
 
+# REPAIR KINDS
+# An annual inspection (resets both the annual date and the hours)
+ANNUAL = 0
+# Any other repair (resets only the hours)
+REPAIR = 1
+# The repair descriptions with a special kind (lowercase); all others are REPAIR
+REPAIR_KINDS = {'annual inspection': ANNUAL}
+
+# An annual is overdue once MORE than 365 whole days have passed since it
+YEAR_SECONDS = 366 * 24 * 60 * 60
+
+
+def build_shop_index(periods):
+    """
+    Returns a search index for the given list of shop periods.
+
+    A shop period is a tuple (in_date, out_date) of times for when a plane
+    entered and left the shop.  The index is a tuple of three parallel lists: the
+    in dates (sorted), the out dates (in the same order), and the latest out date
+    seen so far at each position.  This lets in_shop use binary search instead of
+    checking every period for every lesson.
+
+    Periods with a missing in or out date are ignored.
+
+    Parameter periods: The shop periods for a single plane
+    Precondition: periods is a list of (in_date, out_date) tuples, where each date is
+    either None or a time with in_date <= out_date.  A time is either a datetime
+    object or a number of seconds since the epoch, as long as all times agree
+    """
+    periods = sorted((p for p in periods if p[0] is not None and p[1] is not None),
+                     key=operator.itemgetter(0))
+    in_dates = [p[0] for p in periods]
+    out_dates = [p[1] for p in periods]
+    reach = []
+    for out_date in out_dates:
+        reach.append(out_date if not reach or out_date > reach[-1] else reach[-1])
+    return (in_dates, out_dates, reach)
+
+
+def in_shop(takeoff, landing, index):
+    """
+    Returns True if a flight from takeoff to landing overlaps a shop period.
+
+    A flight overlaps a period if it takes off while the plane is in the shop, if
+    it lands while the plane is in the shop, or if the whole shop period happens
+    during the flight.
+
+    Only periods that start by landing can overlap, and the search stops as soon as
+    no earlier period is still open at takeoff.  So in practice this only looks at
+    one or two periods per flight.
+
+    Parameter takeoff: The takeoff time of this flight
+    Precondition: takeoff is a datetime object (or seconds since the epoch)
+
+    Parameter landing: The landing time of this flight
+    Precondition: landing is a time of the same type no earlier than takeoff
+
+    Parameter index: The shop periods for this plane
+    Precondition: index is a value returned by build_shop_index
+    """
+    in_dates, out_dates, reach = index
+    pos = bisect.bisect_right(in_dates, landing) - 1
+    while pos >= 0 and reach[pos] >= takeoff:
+        in_date = in_dates[pos]
+        out_date = out_dates[pos]
+        if ((takeoff >= in_date and takeoff < out_date) or (landing > in_date and landing <= out_date) or
+            (takeoff <= in_date and landing >= out_date)):
+            return True
+        pos -= 1
+    return False
+
+
+def get_flight_hours(takeoffs, durations, resets, initial):
+    """
+    Returns the hours on a plane at the start of each flight.
+
+    Any repair resets the hours on the plane to 0.  So the flights are split into
+    runs by the number of repairs that come before each takeoff, and the hours for
+    each run are a running total of the durations.  The first run starts with the
+    initial hours, while all later runs start at 0.  A repair at the exact time of
+    a takeoff counts as happening after that flight.
+
+    Parameter takeoffs: The takeoff times of the flights for one plane
+    Precondition: takeoffs is a sorted list of datetime objects (or seconds since the epoch)
+
+    Parameter durations: The length of each flight in hours
+    Precondition: durations is a list of floats, the same length as takeoffs
+
+    Parameter resets: The times of the repairs for this plane
+    Precondition: resets is a sorted list of times of the same type as takeoffs
+
+    Parameter initial: The hours on the plane at the start of the audit
+    Precondition: initial is a float
+    """
+    runs = [bisect.bisect_left(resets, takeoff) for takeoff in takeoffs]
+    result = []
+    for run, group in itertools.groupby(zip(runs, durations), key=operator.itemgetter(0)):
+        start = initial if run == 0 else 0.0
+        result.extend(itertools.accumulate((item[1] for item in group), initial=start))
+        result.pop()  # The total after the last flight of the run is not needed
+    return result
+
 
 def list_inspection_violations(directory):
     """
@@ -89,6 +196,9 @@ def list_inspection_violations(directory):
     Violations of type (3) is annotated 'Grounded'.  If more than one is
     violated, it should be annotated 'Maintenance'.
 
+    The violating lessons are listed in the order of lessons.csv (the same order as
+    the other audits), not grouped by plane.
+
     Example: Suppose that the lessons
 
         S00898  811AX  I072  2017-01-27T13:00:00-05:00  2017-01-27T15:00:00-05:00  VFR  Pattern
@@ -107,75 +217,118 @@ def list_inspection_violations(directory):
     'daycycle.json', 'fleet.csv', 'repairs.csv' and 'lessons.csv'
     """
     # Load data
-    lessons = utils.read_csv(os.path.join(directory, LESSONS))[1:]  # skip header
-    planes = utils.read_csv(os.path.join(directory, PLANES))[1:]
-    repairs = utils.read_csv(os.path.join(directory, REPAIRS))[1:]
-
+    lessons = list(utils.read_rows(os.path.join(directory, LESSONS)))
+    planes = utils.read_csv(os.path.join(directory, PLANES))
+    repairs = utils.read_rows(os.path.join(directory, REPAIRS))
     daycycle = utils.read_json(os.path.join(directory, DAYCYCLE))
+
+    result = []
+    for lesson, annotation in zip(lessons, scan_inspections(lessons, planes, repairs, daycycle), strict=True):
+        if annotation:
+            result.append([*lesson, annotation])
+    return result
+
+
+def scan_inspections(lessons, planes, repairs, daycycle):
+    """
+    Yields the inspection violation for each lesson, in order.
+
+    This function does the work of list_inspection_violations, separated from the
+    file loading so that scan.scan_all can share the loaded files with the other
+    audits.  For each lesson it yields 'Annual', 'Inspection', 'Grounded', or
+    'Maintenance' as described in list_inspection_violations, or the empty string
+    if the lesson is fine.  So it yields exactly one string per lesson.
+
+    As the hours on a plane depend on every earlier flight, all of the lessons are
+    checked before the first result is produced.
+
+    Parameter lessons: The lessons to check
+    Precondition: lessons is a 2d list of lessons (from lessons.csv) WITHOUT the header
+
+    Parameter planes: The table of planes
+    Precondition: planes is the 2d list read from fleet.csv (with header)
+
+    Parameter repairs: The repairs made to the planes
+    Precondition: repairs is an iterable of rows from repairs.csv WITHOUT the header
+
+    Parameter daycycle: The daycycle dictionary (for its timezone)
+    Precondition: daycycle is the dictionary read from daycycle.json
+    """
     timezone = daycycle.get('timezone', 'UTC')
 
-    # Build initial state for each plane
-    plane_state = {}
-    for row in planes:
-        tail = row[0]
-        last_annual = utils.str_to_time(row[5], timezone)
-        hours_since_100 = float(row[6]) if row[6] else 0.0
-        plane_state[tail] = {
-            'last_annual': last_annual,
-            'hours_since_100': hours_since_100,
-            'in_shop_periods': [],
-            'repairs': []
-        }
+    # Times are kept as seconds since the epoch, so the checks below are plain number
+    # comparisons.  Timestamps repeat a lot (lessons start on the hour), so only parse
+    # each one once.
+    @functools.lru_cache(maxsize=None)
+    def to_seconds(timestamp):
+        time = utils.str_to_time(timestamp, timezone)
+        return None if time is None else time.timestamp()
+
+    # Build initial state for each plane, as parallel lists indexed by plane
+    tail_index = {}
+    last_annuals = []
+    shop_periods = []
+    repair_dates = []
+    annual_dates = []
+    for row in planes[1:]:
+        tail_index[row[0]] = len(last_annuals)
+        last_annuals.append(to_seconds(row[5]))
+        shop_periods.append([])
+        repair_dates.append([])
+        annual_dates.append([])
+    # Convert the whole HOURS column at once (a blank entry means no hours yet)
+    start_hours = [float(row[6] or 0) for row in planes[1:]]
     # Add repairs to state
     for row in repairs:
         tail = row[0]
-        in_date = utils.str_to_time(row[1], timezone)
-        out_date = utils.str_to_time(row[2], timezone)
-        desc = row[3].strip().lower()
-        if tail in plane_state:
-            if desc == 'annual inspection':
-                plane_state[tail]['repairs'].append({'type': 'annual', 'date': in_date})
-            else:
-                plane_state[tail]['repairs'].append({'type': 'repair', 'date': in_date})
-            plane_state[tail]['in_shop_periods'].append((in_date, out_date)) 
-
-    # Build a timeline of all events (lessons and repairs) for each plane
-    events = []
-    for lesson in lessons:
-        tail = lesson[1]
-        takeoff = utils.str_to_time(lesson[3], timezone)   # <-- Pass timezone!
-        landing = utils.str_to_time(lesson[4], timezone)   # <-- Pass timezone!
-        events.append((tail, takeoff, 'lesson', lesson, landing))
-    for tail, state in plane_state.items():
-        for rep in state['repairs']:
-            events.append((tail, rep['date'], rep['type'], None, None))
-    events.sort(key=lambda x: (x[0], x[1]))
-
-    # Track state for each plane as we process events
-    current_annual = {tail: state['last_annual'] for tail, state in plane_state.items()}
-    current_hours = {tail: state['hours_since_100'] for tail, state in plane_state.items()}
-    last_landing = {tail: None for tail in plane_state}
-
-    violations = []
-    for event in events:
-        tail, time, etype, lesson, landing = event
-        if etype == 'lesson':
+        in_date = to_seconds(row[1])
+        out_date = to_seconds(row[2])
+        kind = REPAIR_KINDS.get(row[3].strip().lower(), REPAIR)
+        if tail in tail_index:
+            idx = tail_index[tail]
+            # Any repair resets the hours, but only annuals reset the annual date
+            repair_dates[idx].append(in_date)
+            if kind == ANNUAL:
+                annual_dates[idx].append(in_date)
+            shop_periods[idx].append((in_date, out_date))
+
+    # Group the flights by plane, since all state is per plane
+    flights_by_plane = collections.defaultdict(list)
+    for number, lesson in enumerate(lessons):
+        takeoff = to_seconds(lesson[3])
+        landing = to_seconds(lesson[4])
+        flights_by_plane[tail_index[lesson[1]]].append((takeoff, landing, number))
+
+    annotations = [''] * len(lessons)
+
+    for idx, flights in flights_by_plane.items():
+        # Lessons are normally listed in time order, so only sort if they are not
+        if any(prev[0] > flight[0] for prev, flight in zip(flights, itertools.islice(flights, 1, None))):
+            flights.sort(key=operator.itemgetter(0))
+        shop_index = build_shop_index(shop_periods[idx])
+
+        # Work a column at a time instead of replaying events one by one
+        takeoffs = [flight[0] for flight in flights]
+        durations = [(landing - takeoff) / 3600.0 if landing is not None and takeoff is not None else 0.0
+                     for takeoff, landing, number in flights]
+        resets = sorted(repair_dates[idx])
+        annuals = sorted(annual_dates[idx])
+        hours = get_flight_hours(takeoffs, durations, resets, start_hours[idx])
+
+        for pos in range(len(flights)):
+            time, landing, number = flights[pos]
             # Check if plane is in shop during this lesson
-            grounded = False
-            for in_date, out_date in plane_state[tail]['in_shop_periods']:
-                if (in_date is not None and out_date is not None and
-                    ((time >= in_date and time < out_date) or (landing > in_date and landing <= out_date) or (time <= in_date and landing >= out_date))):
-                    grounded = True
-                    break
-            # Check annual
+            grounded = in_shop(time, landing, shop_index)
+            # Check annual (a repair at the same time as takeoff happens after the flight)
             annual = False
-            if current_annual[tail] is not None and (time - current_annual[tail]).days > 365:
+            count = bisect.bisect_left(annuals, time)
+            last_annual = annuals[count-1] if count else last_annuals[idx]
+            if last_annual is not None and time - last_annual >= YEAR_SECONDS:
                 annual = True
             # Check 100-hour
             inspection = False
-            duration = (landing - time).total_seconds() / 3600.0 if landing and time else 0.0
             # Flag if the plane starts at or above 100 hours, or crosses 100 hours during this flight
-            if current_hours[tail] >= 100.0 or (current_hours[tail] < 100.0 and current_hours[tail] + duration > 100.0):
+            if hours[pos] >= 100.0 or hours[pos] + durations[pos] > 100.0:
                 inspection = True
             # Annotate
             annots = []
@@ -186,19 +339,9 @@ def list_inspection_violations(directory):
             if grounded:
                 annots.append('Grounded')
             if len(annots) > 1:
-                annotation = 'Maintenance'
+                annotations[number] = 'Maintenance'
             elif annots:
-                annotation = annots[0]
-            else:
-                annotation = None
-            if annotation:
-                violations.append(lesson + [annotation])
-            # Update state
-            current_hours[tail] += duration
-            last_landing[tail] = landing
-        elif etype == 'annual':
-            current_annual[tail] = time
-            current_hours[tail] = 0.0
-        elif etype == 'repair':
-            current_hours[tail] = 0.0
-    return violations
\ No newline at end of file
+                annotations[number] = annots[0]
+
+    for annotation in annotations:
+        yield annotation
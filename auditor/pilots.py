@@ -39,6 +39,9 @@ Author: Jesus Salgado
 Date: 6/24/2025
 """
 import utils
+import bisect
+import functools
+import itertools
 
 
 # CERTIFICATION CLASSIFICATIONS
@@ -53,6 +56,42 @@ PILOT_CERTIFIED = 2
 # A pilot that 50 hours post license
 PILOT_50_HOURS  = 3
 
+# The flight areas that also match the 'Local' area in the minimums table
+LOCAL_AREAS = frozenset(('Pattern', 'Practice Area', 'Local'))
+
+
+def get_dates(student):
+    """
+    Returns the dates of this pilot as datetime objects.
+    
+    The result is a tuple the same length as student.  Each of the date columns (from
+    the time joining the school to the multiengine endorsement) is converted with
+    utils.str_to_time, while the first three entries, as well as any empty or invalid
+    date, are None.  The dates only have a time zone if the CSV file gave them one.
+    
+    A pilot's dates are checked against every one of their lessons, so each row is
+    only converted once.
+    
+    Parameter student: The student pilot
+    Precondition: student is 10-element list of strings representing a pilot
+    """
+    return _parse_dates(tuple(student))
+
+
+@functools.lru_cache(maxsize=4096)
+def _parse_dates(student):
+    """
+    Returns the tuple of dates for get_dates (cached on the contents of the row).
+    
+    The cache holds the rows of a few thousand pilots, well over the size of a
+    school's roster, and drops the least recently used rows beyond that.
+    
+    Parameter student: The student pilot
+    Precondition: student is 10-element tuple of strings representing a pilot
+    """
+    return tuple(utils.str_to_time(value) if pos >= 3 and value else None
+                 for pos, value in enumerate(student))
+
 
 def get_certification(takeoff,student):
     """
@@ -84,22 +123,87 @@ def get_certification(takeoff,student):
     IDX_LICENSE = 5
     IDX_50HOURS = 6
 
-    # Helper to parse a date string (returns None if empty or invalid)
-    def parse_date(date_str):
-        if not date_str:
-            return None
-        dt = utils.str_to_time(date_str, takeoff.tzinfo)
-        # If dt is naive, assign takeoff's timezone
-        if dt is not None and dt.tzinfo is None:
-            dt = dt.replace(tzinfo=takeoff.tzinfo)
-        return dt
-
-    # Parse all relevant dates
-    joined = parse_date(student[IDX_JOINED])
-    solo = parse_date(student[IDX_SOLO])
-    license = parse_date(student[IDX_LICENSE])
-    hours50 = parse_date(student[IDX_50HOURS])
+    # Search the pilot's milestones, if their dates have no time zones of their own
+    milestones = _get_milestones(tuple(student))
+    if milestones is not None:
+        times, tiers = milestones
+        # Giving a date the takeoff's timezone and comparing is the same as comparing
+        # it to the takeoff's local time (both have the very same tzinfo)
+        pos = bisect.bisect_right(times, takeoff.replace(tzinfo=None)) - 1
+        return tiers[pos] if pos >= 0 else PILOT_INVALID
+
+    # Get all relevant dates (already parsed), with the takeoff's timezone
+    dates = get_dates(student)
+    tzinfo = takeoff.tzinfo
+    joined = _localize(dates[IDX_JOINED], tzinfo)
+    solo = _localize(dates[IDX_SOLO], tzinfo)
+    license = _localize(dates[IDX_LICENSE], tzinfo)
+    hours50 = _localize(dates[IDX_50HOURS], tzinfo)
+    return _classify(takeoff, joined, solo, license, hours50)
+
+
+@functools.lru_cache(maxsize=4096)
+def _get_milestones(student):
+    """
+    Returns the sorted certification milestones of this pilot, for get_certification.
+    
+    The milestones are a tuple of two parallel lists: the dates (sorted) that the pilot
+    joined the school, soloed, got a license, and certified 50 hours, and the best
+    certification the pilot has as of each of those dates.  Any milestone dated before
+    joining the school only counts from that date.  If the pilot never joined, both
+    lists are empty.
+    
+    This function returns None if any of these dates has its own time zone, as then
+    they cannot be compared to a local takeoff time.
+    
+    Like _parse_dates, the cache is bounded to a few thousand pilots.
+    
+    Parameter student: The student pilot
+    Precondition: student is 10-element tuple of strings representing a pilot
+    """
+    dates = _parse_dates(student)
+    joined = dates[3]
+    pairs = [(dates[3], PILOT_NOVICE), (dates[4], PILOT_STUDENT),
+             (dates[5], PILOT_CERTIFIED), (dates[6], PILOT_50_HOURS)]
+    if any(date is not None and date.tzinfo is not None for date, tier in pairs):
+        return None
+    if joined is None:
+        return ([], [])
+    pairs = sorted((max(date, joined), tier) for date, tier in pairs if date is not None)
+    times = [date for date, tier in pairs]
+    tiers = list(itertools.accumulate((tier for date, tier in pairs), max))
+    return (times, tiers)
 
+
+def _localize(dt, tzinfo):
+    """
+    Returns dt with the time zone tzinfo if it is naive, and dt (or None) otherwise.
+    
+    Parameter dt: The date to localize
+    Precondition: dt is a datetime object or None
+    
+    Parameter tzinfo: The time zone to assign
+    Precondition: tzinfo is a tzinfo object or None
+    """
+    # If dt is naive, assign takeoff's timezone
+    if dt is not None and dt.tzinfo is None:
+        dt = dt.replace(tzinfo=tzinfo)
+    return dt
+
+
+def _classify(takeoff, joined, solo, license, hours50):
+    """
+    Returns the certification classification for a takeoff given the pilot's dates.
+    
+    This is the comparison at the heart of get_certification, which has already
+    looked up the dates.  It has no loops or lookups, only comparisons.
+    
+    Parameter takeoff: The takeoff time of this flight
+    Precondition: takeoff is a datetime object with a time zone
+    
+    Parameter joined, solo, license, hours50: The pilot's milestone dates
+    Precondition: each is None or a datetime object comparable to takeoff
+    """
     # If takeoff is before joining, invalid
     if joined is None or takeoff < joined:
         return PILOT_INVALID
@@ -112,12 +216,8 @@ def get_certification(takeoff,student):
     # Soloed before takeoff
     if solo is not None and takeoff >= solo:
         return PILOT_STUDENT
-    # Joined but not soloed
-    if joined is not None and takeoff >= joined:
-        return PILOT_NOVICE
-    # Fallback (should not reach here)
-    return PILOT_INVALID
-
+    # Joined but not soloed (the first check means joined is before takeoff)
+    return PILOT_NOVICE
 
 
 def has_instrument_rating(takeoff,student):
@@ -143,29 +243,7 @@ def has_instrument_rating(takeoff,student):
     """
     # Index for instrument rating in the student list
     IDX_INSTRUMENT = 7
-
-    # Get the instrument rating date string
-    instrument_str = student[IDX_INSTRUMENT]
-
-    # If there is no instrument rating date, return False
-    if not instrument_str:
-        return False
-
-    # Parse the instrument rating date, using the timezone from takeoff if needed
-    instrument_date = utils.str_to_time(instrument_str, takeoff.tzinfo)
-
-    # If parsing failed, treat as no rating
-    if instrument_date is None:
-        return False
-
-    # Ensure both datetimes are timezone-aware or both are naive
-    if instrument_date.tzinfo is None and takeoff.tzinfo is not None:
-        instrument_date = instrument_date.replace(tzinfo=takeoff.tzinfo)
-    elif instrument_date.tzinfo is not None and takeoff.tzinfo is None:
-        takeoff = takeoff.replace(tzinfo=instrument_date.tzinfo)
-
-    # If the rating was earned on or before takeoff, return True
-    return takeoff >= instrument_date
+    return _has_date(takeoff, student, IDX_INSTRUMENT)
 
 
 def has_advanced_endorsement(takeoff,student):
@@ -189,29 +267,7 @@ def has_advanced_endorsement(takeoff,student):
     """
     #Index for advanced endorsement in the student list
     IDX_ADVANCED = 8
-
-    #Get the advanced endorsement date string
-    advanced_str = student[IDX_ADVANCED]
-
-    #If there is no advanced endorsement date, return False
-    if not advanced_str:
-        return False
-
-    #Parse the advanced endorsement date, using the timezone from takeoff if needed
-    advanced_date = utils.str_to_time(advanced_str, takeoff.tzinfo)
-
-    #If parsing failed, treat as no endorsement
-    if advanced_date is None:
-        return False
-
-    # Ensure both datetimes are timezone-aware or both are naive
-    if advanced_date.tzinfo is None and takeoff.tzinfo is not None:
-        advanced_date = advanced_date.replace(tzinfo=takeoff.tzinfo)
-    elif advanced_date.tzinfo is not None and takeoff.tzinfo is None:
-        takeoff = takeoff.replace(tzinfo=advanced_date.tzinfo)
-
-    #If the endorsement was earned on or before takeoff, return True
-    return takeoff >= advanced_date
+    return _has_date(takeoff, student, IDX_ADVANCED)
 
 
 def has_multiengine_endorsement(takeoff,student):
@@ -235,29 +291,42 @@ def has_multiengine_endorsement(takeoff,student):
     """
     # Index for multiengine endorsement in the student list
     IDX_MULTIENGINE = 9
+    return _has_date(takeoff, student, IDX_MULTIENGINE)
 
-    # Get the multiengine endorsement date string
-    multi_str = student[IDX_MULTIENGINE]
 
-    # If there is no multiengine endorsement date, return False
-    if not multi_str:
+def _has_date(takeoff, student, index):
+    """
+    Returns True if the date at position index of student is on or before takeoff.
+    
+    This is the check shared by has_instrument_rating, has_advanced_endorsement, and
+    has_multiengine_endorsement.  It is False if the date is empty or invalid.  If
+    only one of the date and takeoff has a time zone, the other is given the same
+    time zone before they are compared.
+    
+    Parameter takeoff: The takeoff time of this flight
+    Precondition: takeoff is a datetime object
+    
+    Parameter student: The student pilot
+    Precondition: student is 10-element list of strings representing a pilot
+    
+    Parameter index: The position of the date in student
+    Precondition: index is an int for one of the date columns of student
+    """
+    # If there is no date (or parsing failed), there is no qualification
+    if not student[index]:
         return False
-
-    # Parse the multiengine endorsement date, using the timezone from takeoff if needed
-    multi_date = utils.str_to_time(multi_str, takeoff.tzinfo)
-
-    # If parsing failed, treat as no endorsement
-    if multi_date is None:
+    date = get_dates(student)[index]
+    if date is None:
         return False
-
-    # Ensure both datetimes are timezone-aware or both are naive
-    if multi_date.tzinfo is None and takeoff.tzinfo is not None:
-        multi_date = multi_date.replace(tzinfo=takeoff.tzinfo)
-    elif multi_date.tzinfo is not None and takeoff.tzinfo is None:
-        takeoff = takeoff.replace(tzinfo=multi_date.tzinfo)
-
-    # If the endorsement was earned on or before takeoff, return True
-    return takeoff >= multi_date
+    # If the qualification was earned on or before takeoff, return True
+    if date.tzinfo is None:
+        # Giving the date the takeoff's timezone and comparing is the same as comparing
+        # it to the takeoff's local time (both have the very same tzinfo)
+        return takeoff.replace(tzinfo=None) >= date
+    # Ensure both datetimes are timezone-aware
+    if takeoff.tzinfo is None:
+        takeoff = takeoff.replace(tzinfo=date.tzinfo)
+    return takeoff >= date
 
 
 def get_best_value(data, index, maximum=True):
@@ -287,11 +356,8 @@ def get_best_value(data, index, maximum=True):
     Precondition: maximum is a boolean and defaults to True
     
     """
-    #Extract the values from the specified column and convert them to floats
-    values = []
-    for row in data:
-        value = float(row[index]) #Convert string to float
-        values.append(value)
+    #Convert the values in the specified column to floats as they are compared
+    values = (float(row[index]) for row in data)
 
     #Return the maximum or minimum value, depending on the 'maximum' flag
     if maximum:
@@ -300,6 +366,28 @@ def get_best_value(data, index, maximum=True):
         return min(values)
 
 
+def convert_minimums(minimums):
+    """
+    Returns a copy of the minimums table with the numbers converted to floats.
+    
+    The table is the one described in get_minimums (including the header).  In the
+    copy, the last four columns of every row after the header (CEILING, VISIBILITY,
+    WIND, and CROSSWIND) are floats instead of strings.  The original table is not
+    modified.
+    
+    get_minimums accepts either version of the table.  But it is called for every
+    lesson of an audit, so converting the table once up front saves it from turning
+    the same strings into floats over and over.
+    
+    Parameter minimums: The table of allowed minimums
+    Precondition: minimums is a 2d-list (table) as described in get_minimums, including header
+    """
+    result = [minimums[0][:]]
+    for row in minimums[1:]:
+        result.append(row[:4] + [float(value) for value in row[4:8]] + row[8:])
+    return result
+
+
 def get_minimums(cert, area, instructed, vfr, daytime, minimums):
     """
     Returns the most advantageous minimums for the given flight category.
@@ -381,7 +469,8 @@ def get_minimums(cert, area, instructed, vfr, daytime, minimums):
     Precondition: daytime is boolean
     
     Parameter minimums: The table of allowed minimums
-    Precondition: minimums is a 2d-list (table) as described above, including header
+    Precondition: minimums is a 2d-list (table) as described above, including header.
+    The numbers may be strings or floats (see convert_minimums).
     """
     # Indices for columns in the minimums table
     IDX_CATEGORY = 0
@@ -393,53 +482,34 @@ def get_minimums(cert, area, instructed, vfr, daytime, minimums):
     IDX_WIND = 6
     IDX_CROSSWIND = 7
 
-    # Remove header row for processing
-    data = minimums[1:]
-
-    matches = []
-    for row in data:
-        # CATEGORY matching
-        cat = row[IDX_CATEGORY]
-        if cat == 'Dual':
-            if not instructed:
-                continue  # Only match if instructor is present
-        elif cat == '50 Hours':
-            if cert != PILOT_50_HOURS:
-                continue
-        elif cat == 'Certified':
-            if cert < PILOT_CERTIFIED:
-                continue
-        elif cat == 'Student':
-            if cert < PILOT_STUDENT:
-                continue
-
-        # CONDITIONS matching
-        cond = row[IDX_CONDITIONS]
-        if vfr and cond != 'VMC':
-            continue
-        if not vfr and cond != 'IMC':
-            continue
-
-        # AREA matching
-        area_val = row[IDX_AREA]
-        # Flights in 'Pattern' or 'Practice Area' also match 'Local'
-        if area_val == 'Any':
-            pass  # Always matches
-        elif area_val == 'Local':
-            if area not in ['Pattern', 'Practice Area', 'Local']:
-                continue
-        elif area_val != area:
-            continue
-
-        # TIME matching
-        time_val = row[IDX_TIME]
-        if daytime and time_val != 'Day':
-            continue
-        if not daytime and time_val != 'Night':
-            continue
-
-        # If all checks passed, add to matches
-        matches.append(row)
+    # Work out what each column must be once, rather than for every row
+    # CATEGORY matching (any other category always matches)
+    rejected = set()
+    if not instructed:
+        rejected.add('Dual')  # Only match if instructor is present
+    if cert != PILOT_50_HOURS:
+        rejected.add('50 Hours')
+    if cert < PILOT_CERTIFIED:
+        rejected.add('Certified')
+    if cert < PILOT_STUDENT:
+        rejected.add('Student')
+
+    # CONDITIONS matching
+    conditions = 'VMC' if vfr else 'IMC'
+
+    # AREA matching
+    # Flights in 'Pattern' or 'Practice Area' also match 'Local', and all flights match 'Any'
+    areas = {'Any', area}
+    if area in LOCAL_AREAS:
+        areas.add('Local')
+
+    # TIME matching
+    time = 'Day' if daytime else 'Night'
+
+    # A row is a match if all four checks pass (skipping the header row)
+    matches = [row for row in itertools.islice(minimums, 1, None)
+               if row[IDX_CATEGORY] not in rejected and row[IDX_CONDITIONS] == conditions
+               and row[IDX_AREA] in areas and row[IDX_TIME] == time]
 
     # If no matches found, return None
     if not matches:
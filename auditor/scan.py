@@ -0,0 +1,95 @@
+"""
+Module to run all of the audits in a single pass over the lessons.
+
+The modules violations, inspections, and endorsements each check the lessons for
+one kind of violation.  Run separately, each of them loads the lessons (and the
+tables they share, like the students) from disk and loops over every lesson on
+its own.  This module loads every file once, and then walks the lessons a single
+time, asking each audit about the lesson in turn.
+
+Author: Jesus Salgado
+Date: 6/24/2025
+"""
+import utils
+import os.path
+import violations
+import endorsements
+import inspections
+
+
+# FILENAMES
+# Files shared by the audits
+LESSONS = violations.LESSONS
+STUDENTS = violations.STUDENTS
+DAYCYCLE = violations.DAYCYCLE
+
+# The weather audit
+MINIMUMS = violations.MINIMUMS
+WEATHER = violations.WEATHER
+
+# The inspection audit
+PLANES = inspections.PLANES
+REPAIRS = inspections.REPAIRS
+
+# The endorsement audit
+TEACHERS = endorsements.TEACHERS
+
+# The endorsement audit is optional, so this is None if it is not implemented
+_scan_endorsements = getattr(endorsements, 'scan_endorsements', None)
+
+
+def scan_all(directory):
+    """
+    Returns an iterator over each (annotated) flight lesson that violates any of the audits.
+
+    This function loads every file right away, so that a missing or unreadable file
+    is reported before any violation is produced (and before the caller has, say,
+    opened an output file).  The lessons are then checked lazily, as the iterator
+    is consumed.
+
+    The iterator produces the same violations as concatenating the lists returned by
+    list_weather_violations, list_inspection_violations, and list_endorsement_violations.
+    The difference is the order: the violations are grouped by lesson (in the order
+    of lessons.csv), and the violations for a single lesson come in the order weather,
+    inspection, and then endorsement.  A lesson that violates more than one audit is
+    yielded once for each of them, with a different reason at the end.
+
+    Parameter directory: The directory of files to audit
+    Precondition: directory is the name of a directory containing the files 'daycycle.json',
+    'weather.json', 'minimums.csv', 'students.csv', 'instructors.csv', 'lessons.csv',
+    'fleet.csv', and 'repairs.csv'.
+    """
+    # Load every file once
+    lessons = list(utils.read_rows(os.path.join(directory, LESSONS)))
+    students = utils.read_csv(os.path.join(directory, STUDENTS))
+    daycycle = utils.read_json(os.path.join(directory, DAYCYCLE))
+    minimums = utils.read_csv(os.path.join(directory, MINIMUMS))
+    weather = utils.read_json(os.path.join(directory, WEATHER))
+    planes = utils.read_csv(os.path.join(directory, PLANES))
+    repairs = list(utils.read_rows(os.path.join(directory, REPAIRS)))
+
+    scans = [violations.scan_weather(lessons, students, minimums, weather, daycycle),
+             inspections.scan_inspections(lessons, planes, repairs, daycycle)]
+    if _scan_endorsements is not None:
+        instructors = utils.read_csv(os.path.join(directory, TEACHERS))
+        scans.append(_scan_endorsements(lessons, students, instructors, planes))
+    return _join_scans(lessons, scans)
+
+
+def _join_scans(lessons, scans):
+    """
+    Yields each lesson annotated with each non-empty reason from the scans.
+
+    Parameter lessons: The lessons that were checked
+    Precondition: lessons is a 2d list of lessons (from lessons.csv) WITHOUT the header
+
+    Parameter scans: The audits of the lessons
+    Precondition: scans is a list of iterators, each yielding exactly one reason
+    (a string, empty if there is no violation) per lesson
+    """
+    # One pass: each scan yields exactly one reason per lesson (strict, so that a scan
+    # that yields too few or too many is an error instead of misaligned reasons)
+    for lesson, *reasons in zip(lessons, *scans, strict=True):
+        for reason in reasons:
+            if reason:
+                yield [*lesson, reason]
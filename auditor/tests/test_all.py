@@ -17,6 +17,7 @@ if __package__ is None or __package__ == '':
     import test_violations
     import test_endorsements
     import test_inspections
+    import test_scan
 else:
     # Access the module if run from __init__.py (Packages visibility)
     from . import test_app
@@ -25,6 +26,7 @@ else:
     from . import test_violations
     from . import test_endorsements
     from . import test_inspections
+    from . import test_scan
 
 
 # Test the REQUIRE functionality (weather)
@@ -53,5 +55,6 @@ def test(level=TEST_EXTENSION_2):
         test_endorsements.test()
     if level >= TEST_EXTENSION_2:
         test_inspections.test()
+        test_scan.test()
     test_app.test(level)
     print('The application passed all tests')
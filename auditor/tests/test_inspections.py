@@ -248,6 +248,67 @@ def false_positive(flight,hourset):
     return message
 
 
+def test_in_shop():
+    """
+    Tests the functions in_shop and build_shop_index
+    """
+    fcn = 'inspections.in_shop'
+    
+    tz = 'America/New_York'
+    periods = [(utils.str_to_time('2017-03-10',tz),utils.str_to_time('2017-03-12',tz)),
+               (utils.str_to_time('2017-01-05',tz),utils.str_to_time('2017-01-07',tz)),
+               (utils.str_to_time('2017-02-01',tz),utils.str_to_time('2017-02-28',tz)),
+               (utils.str_to_time('2017-02-10',tz),utils.str_to_time('2017-02-11',tz)),
+               (None,utils.str_to_time('2017-06-01',tz))]
+    index = inspections.build_shop_index(periods)
+    
+    tests = [('2017-01-04T09:00:00','2017-01-04T11:00:00',False),
+             ('2017-01-04T23:00:00','2017-01-05T01:00:00',True),
+             ('2017-01-06T09:00:00','2017-01-06T11:00:00',True),
+             ('2017-01-06T23:00:00','2017-01-07T01:00:00',True),
+             ('2017-01-07T00:00:00','2017-01-07T02:00:00',False),
+             ('2017-02-20T09:00:00','2017-02-20T11:00:00',True),
+             ('2017-03-01T09:00:00','2017-03-01T11:00:00',False),
+             ('2017-03-09T09:00:00','2017-03-13T11:00:00',True),
+             ('2017-05-01T09:00:00','2017-05-01T11:00:00',False)]
+    
+    for test in tests:
+        takeoff = utils.str_to_time(test[0],tz)
+        landing = utils.str_to_time(test[1],tz)
+        answr = inspections.in_shop(takeoff,landing,index)
+        data  = (fcn,test[0],test[1],repr(answr),repr(test[2]))
+        assert_equals(test[2],answr,'%s(%s,%s,index) returned %s, not %s' % data)
+    
+    print('  %s passed all tests' % fcn)
+
+
+def test_get_flight_hours():
+    """
+    Tests the function get_flight_hours
+    """
+    fcn = 'inspections.get_flight_hours'
+    
+    tz = 'America/New_York'
+    takeoffs = ['2017-01-02T09:00:00','2017-01-03T09:00:00','2017-01-05T09:00:00',
+                '2017-01-06T09:00:00','2017-01-09T09:00:00','2017-01-10T09:00:00']
+    takeoffs = [utils.str_to_time(item,tz) for item in takeoffs]
+    durations = [2.0,3.0,1.5,2.0,4.0,1.0]
+    
+    tests = [([],[90.0,92.0,95.0,96.5,98.5,102.5]),
+             (['2017-01-04'],[90.0,92.0,0.0,1.5,3.5,7.5]),
+             (['2017-01-04','2017-01-07'],[90.0,92.0,0.0,1.5,0.0,4.0]),
+             (['2017-01-05T09:00:00','2017-01-11'],[90.0,92.0,95.0,0.0,2.0,6.0]),
+             (['2017-01-01'],[0.0,2.0,5.0,6.5,8.5,12.5])]
+    
+    for test in tests:
+        resets = [utils.str_to_time(item,tz) for item in test[0]]
+        answr = inspections.get_flight_hours(takeoffs,durations,resets,90.0)
+        data  = (fcn,repr(test[0]),repr(answr),repr(test[1]))
+        assert_float_lists_equal(test[1],answr,'%s with repairs %s returned %s, not %s' % data)
+    
+    print('  %s passed all tests' % fcn)
+
+
 def test_list_inspection_violations():
     """
     Tests the function list_inspection_violations
@@ -305,4 +366,6 @@ def test():
     Performs all tests on the module endorsements.
     """
     print('Testing module inspections')
+    test_in_shop()
+    test_get_flight_hours()
     test_list_inspection_violations()
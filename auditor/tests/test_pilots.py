@@ -48,6 +48,35 @@ def cert_to_name(cert):
     return cert
 
 
+def test_get_dates():
+    """
+    Tests the function pilots.get_dates
+    """
+    fcn = 'pilots.get_dates'
+    
+    # Access the file relative to this one, not the user's terminal
+    parent = os.path.split(__file__)[0]
+    fpath  = os.path.join(parent,'students.csv')
+    table = utils.read_csv(fpath)
+    
+    # TEST CASES
+    D = datetime.datetime
+    students = {'S00313' : (None,None,None,D(2015,1,14),D(2015,3,2),None,None,None,None,None),
+                'S00353' : (None,None,None,D(2015,3,11),D(2015,4,29),D(2015,6,5),D(2015,9,8),None,None,None)}
+    
+    # CHECK THE TEST CASES
+    for person in students:
+        row   = utils.get_for_id(person,table)
+        dates = pilots.get_dates(row)
+        assert_equals(students[person], dates,
+          '%s returned %s for %s, but should have been %s' % (fcn,repr(dates),person,repr(students[person])))
+        # Asking again must give the same answer
+        assert_equals(dates, pilots.get_dates(row),
+          '%s did not return the same dates a second time for %s' % (fcn,person))
+    
+    print('  %s passed all tests' % fcn)
+
+
 def test_get_certification():
     """
     Tests the function pilots.get_certification
@@ -206,6 +235,41 @@ def test_get_best_value():
     print('  %s passed all tests' % fcn)
 
 
+def test_convert_minimums():
+    """
+    Tests the function pilots.convert_minimums
+    """
+    fcn = 'pilots.convert_minimums'
+    
+    # Test the standard table
+    parent = os.path.split(__file__)[0]
+    fpath  = os.path.join(parent,'minimums.csv')
+    table = utils.read_csv(fpath)
+    original = [row[:] for row in table]
+    result = pilots.convert_minimums(table)
+    
+    assert_equals(original, table, '%s modified the original table' % fcn)
+    assert_equals(table[0], result[0], '%s changed the header: %s' % (fcn,repr(result[0])))
+    assert_equals(len(table), len(result), '%s did not keep every row' % fcn)
+    for pos in range(1,len(table)):
+        assert_equals(table[pos][:4], result[pos][:4],
+          '%s changed the text columns of row %s: %s' % (fcn,pos,repr(result[pos])))
+        assert_float_lists_equal([float(x) for x in table[pos][4:]], result[pos][4:],
+          '%s did not convert the numbers of row %s: %s' % (fcn,pos,repr(result[pos])))
+    
+    # The converted table gives the same minimums
+    for cert in range(pilots.PILOT_INVALID,pilots.PILOT_50_HOURS+1):
+        for area in ('Pattern','Practice Area','Cross Country'):
+            for vfr in (True,False):
+                args = (cert,area,False,vfr,True)
+                expected = pilots.get_minimums(*args,table)
+                received = pilots.get_minimums(*args,result)
+                assert_equals(expected, received,
+                  '%s gave a table where get_minimums%s returns %s, not %s' % (fcn,repr(args),repr(received),repr(expected)))
+    
+    print('  %s passed all tests' % fcn)
+
+
 def test_get_minimums():
     """
     Tests the function pilots.get_minimums
@@ -406,10 +470,12 @@ def test(level=TEST_BASIC_APP):
     Performs all tests on the module pilots.
     """
     print('Testing module pilots')
+    test_get_dates()
     test_get_certification()
     if level >= TEST_EXTENSION_1:
         test_has_instrument_rating()
         test_has_advanced_endorsement()
         test_has_multiengine_endorsement()
     test_get_best_value()
+    test_convert_minimums()
     test_get_minimums()
@@ -0,0 +1,61 @@
+"""
+Test procedures for the single-pass audit in scan.py.
+
+These tests read from the files in the same directory as this file.
+
+Author: Jesus Salgado
+Date: 6/24/2025
+"""
+# See: https://stackoverflow.com/questions/14132789/relative-imports-for-the-billionth-time
+if __package__ is None or __package__ == '':
+    # Access the module if run from __main__.py (Script visibility)
+    from support import *
+else:
+    # Access the module if run from __init__.py (Packages visibility)
+    from .support import *
+
+# Load the application modules
+utils = load_from_path('utils')
+scan = load_from_path('scan')
+violations = load_from_path('violations')
+inspections = load_from_path('inspections')
+endorsements = load_from_path('endorsements')
+
+
+def test_scan_all():
+    """
+    Tests the function scan_all
+    """
+    fcn = 'scan.scan_all'
+    
+    parent = os.path.split(__file__)[0]
+    results = list(scan.scan_all(parent))
+    
+    # The same violations as the three audits run separately
+    correct  = violations.list_weather_violations(parent)
+    correct += inspections.list_inspection_violations(parent)
+    correct += endorsements.list_endorsement_violations(parent)
+    assert_equals(len(correct), len(results),
+                  '%s(tests) found %d violations, not %d' % (fcn,len(results),len(correct)))
+    assert_equals(sorted(correct), sorted(results),
+                  '%s(tests) did not find the same violations as the separate audits' % fcn)
+    
+    # Grouped by lesson, in the order of lessons.csv
+    lessons = utils.read_csv(os.path.join(parent,'lessons.csv'))[1:]
+    pos = 0
+    for item in results:
+        try:
+            pos = lessons.index(item[:-1],pos)
+        except ValueError:
+            data = (fcn,item[3],item[0])
+            quit_with_error('%s(tests) listed the flight %s for pilot %s out of order' % data)
+    
+    print('  %s passed all tests' % fcn)
+
+
+def test():
+    """
+    Performs all tests on the module scan.
+    """
+    print('Testing module scan')
+    test_scan_all()
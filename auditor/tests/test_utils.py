@@ -9,6 +9,7 @@ Date:   June 7, 2019
 
 import os.path
 import json
+import datetime
 # See: https://stackoverflow.com/questions/14132789/relative-imports-for-the-billionth-time
 if __package__ is None or __package__ == '':
     # Access the module if run from __main__.py (Script visibility)
@@ -185,6 +186,26 @@ def test_read_csv():
     print('  %s passed all tests' % fcn)
 
 
+def test_read_rows():
+    """
+    Tests the function utils.read_rows
+    """
+    fcn = 'utils.read_rows'
+    
+    # Access the file relative to this one, not the user's terminal
+    parent = os.path.split(__file__)[0]
+    fpath  = os.path.join(parent,'file1.csv')
+    rows = utils.read_rows(fpath)
+    
+    assert_true(not isinstance(rows, list),
+                  '%s returned a list instead of producing the rows lazily' % fcn)
+    table = list(rows)
+    assert_equals(FILE1[1:], table,
+                  '%s did not return the correct rows (without the header): %s vs %s' % (fcn,repr(table), repr(FILE1[1:])))
+    
+    print('  %s passed all tests' % fcn)
+
+
 def test_write_csv():
     """
     Tests the function utils.write_csv
@@ -213,6 +234,16 @@ def test_write_csv():
         assert_equals(FILE2[pos], line,
                       '%s did not write the correct values for line %d' % (fcn,pos))
     
+    # Dates are ISO formatted wherever they appear, even below other values in a column
+    fpath  = os.path.join(parent,'file4.csv')
+    utils.write_csv([['A','B'],['x',None],['y',datetime.datetime(2017,1,7,10)]],fpath)
+    file = open(fpath)
+    data = file.read().strip().split('\n')
+    file.close()
+    os.remove(fpath)
+    assert_equals(['y','2017-01-07T10:00:00'], data[2].strip().split(','),
+                  '%s did not write a datetime in ISO format' % fcn)
+    
     print('  %s passed all tests' % fcn)
 
 
@@ -286,6 +317,11 @@ def test_str_to_time():
     result  =  utils.str_to_time(input,central)
     assert_equals(correct, result, '%s could not handle time zone string %s' % (fcn,repr(central)))
     
+    # A date with an offset but no time is not a valid timestamp
+    for input in ['2016-04-06+00:00','2016-04-06Z']:
+        assert_equals(None, utils.str_to_time(input),
+                      '%s did not reject %s' % (fcn,repr(input)))
+    
     print('  %s passed all tests' % fcn)
 
 def test_daytime():
@@ -357,14 +393,39 @@ def test_get_for_id():
     print('  %s passed all tests' % fcn)
 
 
+def test_build_index():
+    """
+    Tests the function utils.build_index
+    """
+    fcn = 'utils.build_index'
+    
+    index = utils.build_index(FILE1)
+    assert_equals(dict, type(index), '%s did not return a dictionary: %s' % (fcn,repr(index)))
+    assert_equals(len(set(row[0] for row in FILE1[1:])), len(index),
+                  '%s did not index every id (without the header): %s' % (fcn,repr(index)))
+    for row in FILE1[1:]:
+        assert_equals(utils.get_for_id(row[0],FILE1), index.get(row[0]),
+                      '%s did not map %s to its row in %s' % (fcn,repr(row[0]),repr(FILE1)))
+    assert_equals(None, index.get(FILE1[0][0]), '%s included the header row' % fcn)
+    
+    # Next table
+    index = utils.build_index(FILE2)
+    assert_equals(FILE2[2], index.get('811AX'),
+                  '%s was unable to find plane %s in %s' % (fcn,repr('811AX'),repr(FILE2)))
+    
+    print('  %s passed all tests' % fcn)
+
+
 def test():
     """
     Performs all tests on the module utils.
     """
     print('Testing module utils')
     test_read_csv()
+    test_read_rows()
     test_write_csv()
     test_read_json()
     test_str_to_time()
     test_daytime()
     test_get_for_id()
+    test_build_index()
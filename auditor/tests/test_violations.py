@@ -146,6 +146,7 @@ def test_get_weather_report():
              ("2017-12-27T23:00:00-05:00","2017-12-27T22:00:00-05:00")]
     
     # Perform the tests
+    index = violations.sort_weather(report)
     for test in tests:
         expct = report[test[1]]
         stamp = utils.str_to_time(test[0])
@@ -157,6 +158,16 @@ def test_get_weather_report():
         
         data  = (fcn,test[0],'weather',code,repr(expct['code']))
         assert_equals(expct, found,'%s(%s,%s) returned a report with %s, not code=%s' % data)
+        
+        # The sorted report times must give the same answer
+        found = violations.get_weather_report(stamp,report,index)
+        assert_equals(expct, found,'%s(%s,%s,index) returned the wrong report' % data[:3])
+    
+    # Nothing is before the earliest report
+    first = utils.str_to_time(index[1][0])
+    stamp = first.replace(year=first.year-1)
+    found = violations.get_weather_report(stamp,report,index)
+    assert_equals(None, found,'%s(%s,%s,index) did not return None' % (fcn,stamp.isoformat(),'weather'))
     
     print('  %s passed all tests' % fcn)
 
@@ -16,10 +16,15 @@ Date: 6/24/2025
 import csv
 import json
 import datetime
+import functools
 from dateutil import parser
 import pytz
 
 
+# The buffer size for reading CSV files (the lesson files are large)
+BUFFER_SIZE = 1 << 17
+
+
 def read_csv(filename):
     """
     Returns the contents read from the CSV file filename.
@@ -33,14 +38,31 @@ def read_csv(filename):
     Precondition: filename is a string, referring to a file that exists, and that file 
     is a valid CSV file
     """
-    result = []
     #Open the file with the universal newline support and UTF-8 encoding
-    with open(filename, newline='', encoding='utf-8') as csvfile:
+    with open(filename, newline='', encoding='utf-8', buffering=BUFFER_SIZE) as csvfile:
         reader = csv.reader(csvfile)  #Create a CSV reader object
+        #Result the 2D list of rows (including header as first row)
+        return list(reader)
+
+
+def read_rows(filename):
+    """
+    Yields the rows of the CSV file filename, skipping the header.
+    
+    Unlike read_csv, this function does not build the 2-dimensional list in memory.
+    The rows are read from the file one at a time as they are needed, which is much
+    cheaper for large files like lessons.csv and repairs.csv that we only loop over
+    once.  Each row is a list of strings.
+    
+    Parameter filename: The file to read
+    Precondition: filename is a string, referring to a file that exists, and that file
+    is a valid CSV file with a header
+    """
+    with open(filename, newline='', encoding='utf-8', buffering=BUFFER_SIZE) as csvfile:
+        reader = csv.reader(csvfile)
+        next(reader, None)  # skip header
         for row in reader:
-            result.append(row)      #Add each row (as a list of strings) to result
-    #Result the 2D list of rows (including header as first row)
-    return result
+            yield row
 
 
 def write_csv(data,filename):
@@ -93,14 +115,57 @@ def read_json(filename):
     return data
 
 
+@functools.lru_cache(maxsize=100_000)
+def _parse_time(timestamp):
+    """
+    Returns the datetime object for the given timestamp (or None if timestamp is invalid).
+    
+    This is the parse behind str_to_time.  The same timestamps, such as
+    a pilot's certification dates, are converted over and over again during an audit,
+    so the result for each timestamp string is cached (up to 100,000 of them, so that a
+    long-running process does not hold on to every timestamp it has ever seen).  A
+    datetime object is immutable, so it is safe to share between callers.
+    
+    Parameter timestamp: The time stamp to convert
+    Precondition: timestamp is a string
+    """
+    # Nearly every timestamp is ISO formatted, which the (much faster) built-in parser
+    # understands.  Only fall back to dateutil for anything else.  The built-in parser
+    # also accepts a date with an offset but no time (like '2016-04-06+00:00'), which
+    # dateutil rejects, so only timestamps with a time separator take the fast path.
+    if 'T' in timestamp or ' ' in timestamp:
+        try:
+            if timestamp.endswith('Z'):
+                timestamp = timestamp[:-1] + '+00:00'
+            return datetime.datetime.fromisoformat(timestamp)
+        except Exception:
+            pass
+    try:
+        return parser.parse(timestamp)
+    except Exception:
+        return None
+
+
+@functools.lru_cache(maxsize=32)
+def _get_timezone(tzname):
+    """
+    Returns the pytz time zone with the given name (cached, as it is looked up often).
+    
+    Parameter tzname: The name of the time zone
+    Precondition: tzname is a string naming a valid time zone
+    """
+    return pytz.timezone(tzname)
+
+
 def str_to_time(timestamp,tzsource=None):
     """
     Returns the datetime object for the given timestamp (or None if timestamp is 
     invalid).
     
-    This function should just use the parse function in dateutil.parser to
-    convert the timestamp to a datetime object.  If it is not a valid date (so
-    the parser crashes), this function should return None.
+    This function converts the timestamp with the (cached) helper _parse_time, which
+    reads ISO formatted timestamps with datetime.fromisoformat and falls back to the
+    parse function in dateutil.parser for anything else.  If it is not a valid date
+    (so both parsers fail), this function returns None.
     
     If the timestamp has a time zone, then it should keep that time zone even if
     the value for tzsource is not None.  Otherwise, if timestamp has no time zone 
@@ -119,11 +184,9 @@ def str_to_time(timestamp,tzsource=None):
     Precondition: tzsource is either None, a string naming a valid time zone,
     or a datetime object.
     """
-    try:
-        # Parse the timestamp string into a datetime object
-        dt = parser.parse(timestamp)
-    except Exception:
-        # Return None if parsing fails
+    # Parse the timestamp string into a datetime object (None if parsing fails)
+    dt = _parse_time(timestamp)
+    if dt is None:
         return None
 
     # If the parsed datetime already has a timezone, return as is
@@ -134,7 +197,7 @@ def str_to_time(timestamp,tzsource=None):
     if tzsource is not None:
         if isinstance(tzsource, str):
             # tzsource is a string: use pytz to get the timezone and localize
-            tz = pytz.timezone(tzsource)
+            tz = _get_timezone(tzsource)
             dt = tz.localize(dt)
         elif hasattr(tzsource, 'tzinfo') and tzsource.tzinfo is not None:
             # tzsource is a datetime object with tzinfo: use its timezone
@@ -181,9 +244,9 @@ def daytime(time,daycycle):
     Parameter daycycle: The daycycle dictionary
     Precondition: daycycle is a valid daycycle dictionary, as described above
     """
-    # Get the year and mm-dd string for lookup
+    # Get the year and mm-dd string for lookup (formatting the ints is cheaper than strftime)
     year = str(time.year)
-    mm_dd = time.strftime('%m-%d')
+    mm_dd = '%02d-%02d' % (time.month, time.day)
 
     # Get the timezone from the daycycle dictionary
     tzname = daycycle.get('timezone')
@@ -200,34 +263,55 @@ def daytime(time,daycycle):
     if sunrise_str is None or sunset_str is None:
         return None  # Missing sunrise or sunset
 
-    # Build ISO datetime strings for sunrise and sunset
-    date_str = time.date().isoformat()
-    sunrise_iso = f"{date_str}T{sunrise_str}"
-    sunset_iso = f"{date_str}T{sunset_str}"
-
     # Convert sunrise and sunset to datetime objects with correct timezone
-    sunrise = str_to_time(sunrise_iso, tzname)
-    sunset = str_to_time(sunset_iso, tzname)
+    daylight = _get_daylight(year, mm_dd, sunrise_str, sunset_str, tzname)
 
     # If conversion failed, return None
-    if sunrise is None or sunset is None:
+    if daylight is None:
         return None
+    sunrise, sunset = daylight
 
-    # Get the timezone object
-    tz = pytz.timezone(tzname)
-
-    # Convert all times to the same timezone for comparison
+    # A naive time is in the timezone of the daycycle dictionary.  An aware time can be
+    # compared as is (comparisons between aware datetimes do not depend on time zone).
     if time.tzinfo is None:
-        time = tz.localize(time)
-    else:
-        time = time.astimezone(tz)
-    sunrise = sunrise.astimezone(tz)
-    sunset = sunset.astimezone(tz)
+        time = _get_timezone(tzname).localize(time)
 
     # Return True if time is during the day, False otherwise
     return sunrise < time < sunset
 
 
+@functools.lru_cache(maxsize=1024)
+def _get_daylight(year, mm_dd, sunrise_str, sunset_str, tzname):
+    """
+    Returns the tuple (sunrise, sunset) of datetime objects for a day, or None if invalid.
+    
+    This is the conversion behind daytime.  Every lesson on the same day has the same
+    sunrise and sunset, so the result for each day is cached (for up to 1024 days,
+    a few years of lessons).
+    
+    Parameter year: The year of the day
+    Precondition: year is a string of a (four digit) year
+    
+    Parameter mm_dd: The month and day of the day
+    Precondition: mm_dd is a string of the form 'mm-dd'
+    
+    Parameter sunrise_str: The time of sunrise in 24-hour time format
+    Precondition: sunrise_str is a string
+    
+    Parameter sunset_str: The time of sunset in 24-hour time format
+    Precondition: sunset_str is a string
+    
+    Parameter tzname: The time zone of sunrise and sunset
+    Precondition: tzname is a string naming a valid time zone
+    """
+    # Build ISO datetime strings for sunrise and sunset, and convert them
+    sunrise = str_to_time(f"{year}-{mm_dd}T{sunrise_str}", tzname)
+    sunset = str_to_time(f"{year}-{mm_dd}T{sunset_str}", tzname)
+    if sunrise is None or sunset is None:
+        return None
+    return (sunrise, sunset)
+
+
 def get_for_id(id,table):
     """
     Returns (a copy of) a row of the table with the given id.
@@ -252,3 +336,25 @@ def get_for_id(id,table):
             return row.copy() # Return a copy of the matching row
     #If no matching row is found, return None
     return None
+
+
+def build_index(table):
+    """
+    Returns a dictionary mapping each identifier in table to its row.
+    
+    Table is a two-dimensional list with a header, where the first element of each row
+    is an identifier (string), as in get_for_id.  Looking a row up in the dictionary
+    takes the same time no matter how long the table is, while get_for_id has to search
+    the table.  So build the index once when looking up many rows of the same table.
+    
+    The rows in the dictionary are the rows of table, NOT copies.  So they should not
+    be modified.  If an identifier appears more than once, the first row wins (like
+    get_for_id).  The header row is not included.
+    
+    Parameter table: The 2-dimensional table of data
+    Precondition: table is a non-empty 2-dimension list of strings, including header
+    """
+    index = {}
+    for row in table[1:]:
+        index.setdefault(row[0], row)
+    return index
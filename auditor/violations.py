@@ -34,6 +34,14 @@ Date: 6/24/2025
 import utils
 import pilots
 import os.path
+import bisect
+
+
+# The cloud layers that count as a ceiling
+CEILING_TYPES = frozenset(('broken', 'overcast', 'indefinite ceiling'))
+
+# Knots in one meter per second
+MPS_TO_KT = 1.94384
 
 
 # WEATHER FUNCTIONS
@@ -71,11 +79,7 @@ def bad_visibility(visibility,minimum):
     Parameter minimum: The minimum allowed visibility (in statute miles)
     Precondition: minimum is a float or int
     """
-    # If visibility is 'unavailable', always return True (bad record keeping)
-    if visibility == 'unavailable':
-        return True
-
-    # If visibility is a dictionary, process the values
+    # If visibility is a dictionary (the usual case), process the values
     if isinstance(visibility, dict):
         # Use 'minimum' if it exists and is not None, otherwise use 'prevailing'
         if 'minimum' in visibility and visibility['minimum'] is not None:
@@ -90,7 +94,8 @@ def bad_visibility(visibility,minimum):
         # Return True if the minimum is greater than the measured value (violation)
         return value < minimum
 
-    # If visibility is not a recognized type, treat as violation (conservative)
+    # If visibility is 'unavailable' (bad record keeping) or not a recognized type,
+    # treat as violation (conservative)
     return True
 
 
@@ -136,38 +141,30 @@ def bad_winds(winds,maxwind,maxcross):
     Parameter maxcross: The maximum allowable crosswind speed (in knots)
     Precondition: maxcross is a float or int
     """
-    #If winds are 'calm', always return False (no violation)
-    if winds == 'calm':
-        return False
-
-    #If winds are 'unavailable', always return True (bad record keeping)
-    if winds == 'unavailable':
-        return True
-
-    #If winds is a dictionary, process the values
+    #If winds is a dictionary (the usual case), process the values
     if isinstance(winds, dict):
         #Extract speed and gusts (gusts is optional)
         speed = winds.get('speed', 0.0)
         gusts = winds.get('gusts', speed) #If gusts not present use speed
         crosswind = winds.get('crosswind', 0.0)
-        units = winds.get('units', 'KT')
-
-        #Convert all values to knots if needed
-        if units == 'MPS':
-            speed = speed * 1.94384
-            gusts = gusts * 1.94384
-            crosswind = crosswind * 1.94384
 
         #Use the worst wind (max of speed and gusts)
-        worst_wind = max(speed, gusts)
+        worst_wind = gusts if gusts > speed else speed
+
+        #Convert to knots if needed (after the max, as scaling keeps the order)
+        if winds.get('units', 'KT') == 'MPS':
+            worst_wind = worst_wind * MPS_TO_KT
+            crosswind = crosswind * MPS_TO_KT
 
         #Check if either wind or crosswind exceeds the maximums
-        if worst_wind > maxwind or crosswind > maxcross:
-            return True
-        else:
-            return False
+        return worst_wind > maxwind or crosswind > maxcross
+
+    #If winds are 'calm', always return False (no violation)
+    if winds == 'calm':
+        return False
 
-    #If winds is not a recognized type, treat a violation (conservative)
+    #If winds are 'unavailable' (bad record keeping) or not a recognized type, treat
+    #as a violation (conservative)
     return True
     
 
@@ -223,19 +220,13 @@ def bad_ceiling(ceiling,minimum):
 
     #If ceiling is a  list of cloud layers, process the layers
     if isinstance(ceiling, list):
-        #List to store heights of relevant cloud layers
-        relevant_heights = []
-        for layer in ceiling:
-            #Only consider 'broken', 'overcast', or 'indefinite ceiling'
-            if layer.get('type') in ['broken', 'overcast', 'indefinite ceiling']:
-                #Ensure units are 'FT' as required
-                if layer.get('units') == 'FT':
-                    relevant_heights.append(layer.get('height'))
+        #Find the lowest 'broken', 'overcast', or 'indefinite ceiling' layer (in FT)
+        lowest = min((layer.get('height') for layer in ceiling
+                      if layer.get('type') in CEILING_TYPES and layer.get('units') == 'FT'),
+                     default=None)
         #If there are no relevant layers, return False (no violation)
-        if not relevant_heights:
+        if lowest is None:
             return False
-        #Find the lowest relevant cloud layer
-        lowest = min(relevant_heights)
         #Return True if the minimum is greater than the lowest layer (violation)
         return lowest < minimum
     
@@ -243,7 +234,7 @@ def bad_ceiling(ceiling,minimum):
     return True
 
 
-def get_weather_report(takeoff,weather):
+def get_weather_report(takeoff,weather,index=None):
     """
     Returns the most recent weather report at or before take-off.
     
@@ -316,6 +307,11 @@ def get_weather_report(takeoff,weather):
     
     Paramater weather: The weather report dictionary 
     Precondition: weather is a dictionary formatted as described above
+    
+    Parameter index: The report times of weather (optional)
+    Precondition: index is None or the result of sort_weather(weather), built after
+    the last change to weather.  Pass it when looking up many takeoffs in the same
+    weather; without it, every key of weather is parsed and compared on each call.
     """
     # Convert takeoff time to ISO string (matches the keys in weather)
     takeoff_iso = takeoff.isoformat()
@@ -324,26 +320,69 @@ def get_weather_report(takeoff,weather):
     if takeoff_iso in weather:
         return weather[takeoff_iso]
 
-    # If not, search for the most recent report before takeoff
-    closest_time = None
-    for key in weather:
+    # Without an index, search the whole dictionary for the most recent report before takeoff
+    if index is None:
+        closest_time = None
+        for key in weather:
+            try:
+                # Parse the key as a datetime object
+                report_time = utils.str_to_time(key, takeoff.tzinfo)
+                # Only consider reports before takeoff
+                if report_time is not None and report_time < takeoff:
+                    # Update if this is the latest report before takeoff
+                    if closest_time is None or report_time > closest_time:
+                        closest_time = report_time
+                        closest_key = key
+            except Exception:
+                continue  # Skip keys that can't be parsed
+        return weather[closest_key] if closest_time is not None else None
+
+    # Otherwise, search the sorted report times for the most recent report before takeoff
+    if takeoff.tzinfo is None:
+        times, keys = index[2], index[3]
+        when = takeoff
+    else:
+        times, keys = index[0], index[1]
+        when = takeoff.timestamp()
+    pos = bisect.bisect_left(times, when)
+    
+    # Return the most recent report before takeoff, or None if not found
+    return weather[keys[pos-1]] if pos > 0 else None
+
+
+def sort_weather(weather):
+    """
+    Returns the report times of the weather dictionary, sorted for get_weather_report.
+    
+    The result is a tuple of four lists.  The first two are the times (as POSIX 
+    timestamps) and keys of the reports with a time zone, sorted by time.  The last two
+    are the times and keys of the reports without one, sorted the same way.  Keys that
+    are not timestamps are left out.  If two keys have the same time, the one that
+    comes first in the dictionary is sorted last, so that it is the one found.
+    
+    Building this once lets get_weather_report find a report by bisection, instead of
+    parsing every key in the dictionary for each takeoff.
+    
+    Parameter weather: The weather report dictionary 
+    Precondition: weather is a dictionary formatted as for get_weather_report
+    """
+    aware = []
+    naive = []
+    for pos, key in enumerate(weather):
         try:
-            # Parse the key as a datetime object
-            report_time = utils.str_to_time(key, takeoff.tzinfo)
-            # Only consider reports before takeoff
-            if report_time is not None and report_time < takeoff:
-                # Update if this is the latest report before takeoff
-                if closest_time is None or report_time > closest_time:
-                    closest_time = report_time
-                    closest_key = key
+            report_time = utils.str_to_time(key)
         except Exception:
             continue  # Skip keys that can't be parsed
-
-    # Return the most recent report before takeoff, or None if not found
-    if closest_time is not None:
-        return weather[closest_key]
-    else:
-        return None
+        if report_time is None:
+            continue
+        if report_time.tzinfo is None:
+            naive.append((report_time, -pos, key))
+        else:
+            aware.append((report_time.timestamp(), -pos, key))
+    aware.sort()
+    naive.sort()
+    return ([item[0] for item in aware], [item[2] for item in aware],
+            [item[0] for item in naive], [item[2] for item in naive])
 
 
 def get_weather_violation(weather,minimums):
@@ -411,26 +450,21 @@ def get_weather_violation(weather,minimums):
     #Unpack the minimums
     min_ceiling, min_visibility, max_wind, max_crosswind = minimums
 
-    #Check each violation type
+    #Check each violation type, stopping as soon as two have failed
     vis = bad_visibility(weather.get('visibility'), min_visibility)
     wind = bad_winds(weather.get('wind'), max_wind, max_crosswind)
+    if vis and wind:
+        return 'Weather'
     ceil = bad_ceiling(weather.get('sky'), min_ceiling)
 
-    #Count how many are True
-    violations = [vis, wind, ceil]
-    count = sum(1 for v in violations if v)
-
     #Return the appropriate string
-    if count == 0:
-        return ''
-    if count > 1:
-        return 'Weather'
+    if ceil:
+        return 'Weather' if vis or wind else 'Ceiling'
     if vis:
         return 'Visibility'
     if wind:
         return 'Winds'
-    if ceil:
-        return 'Ceiling'
+    return ''
 
 
 # FILES TO AUDIT
@@ -485,61 +519,115 @@ def list_weather_violations(directory):
     'weather.json', 'minimums.csv', 'students.csv', and 'lessons.csv'
     """
     # Load all required files using the utils and pilots modules
-    lessons = utils.read_csv(os.path.join(directory, LESSONS))
+    lessons = list(utils.read_rows(os.path.join(directory, LESSONS)))  # skip header row
     students = utils.read_csv(os.path.join(directory, STUDENTS))
     minimums = utils.read_csv(os.path.join(directory, MINIMUMS))
     weather = utils.read_json(os.path.join(directory, WEATHER))
     daycycle = utils.read_json(os.path.join(directory, DAYCYCLE))  # Load daycycle.json for timezone and day/night
 
-    # Prepare result list for violations
-    violations = []
+    result = []
+    for lesson, violation in zip(lessons, scan_weather(lessons, students, minimums, weather, daycycle), strict=True):
+        # If there is a violation, add a copy of the lesson with violation appended
+        if violation:
+            result.append([*lesson, violation])
+    return result
+
 
-    # Iterate through each lesson (skip header row)
-    for lesson in lessons[1:]:
+def scan_weather(lessons, students, minimums, weather, daycycle):
+    """
+    Yields the weather violation for each lesson, in order.
+    
+    This function is the loop at the heart of list_weather_violations, separated from
+    the file loading so that scan.scan_all can share the loaded files with the other
+    audits.  For each lesson it yields the result of get_weather_violation(), or the
+    empty string if the lesson is fine (or cannot be checked, such as a lesson with
+    an unknown student).  So it yields exactly one string per lesson.
+    
+    Parameter lessons: The lessons to check
+    Precondition: lessons is a 2d list of lessons (from lessons.csv) WITHOUT the header
+    
+    Parameter students: The table of students
+    Precondition: students is the 2d list read from students.csv (with header)
+    
+    Parameter minimums: The table of allowed minimums
+    Precondition: minimums is the 2d list read from minimums.csv (with header)
+    
+    Parameter weather: The weather report dictionary
+    Precondition: weather is the dictionary read from weather.json
+    
+    Parameter daycycle: The daycycle dictionary
+    Precondition: daycycle is the dictionary read from daycycle.json
+    """
+    # Convert the numbers in the minimums table once, instead of for every lesson
+    minimums = pilots.convert_minimums(minimums)
+    # Only a few dozen different flight categories ever occur, so remember their minimums
+    category_minimums = {}
+
+    # Normalize the FILED column (for case and whitespace) once, up front
+    filed_vfr = [len(lesson) > 5 and lesson[5].strip().upper() == 'VFR' for lesson in lessons]
+
+    # Index the students by id once, instead of searching the table for every lesson
+    student_index = utils.build_index(students)
+
+    # Sort the weather reports by time once, instead of scanning them for every lesson
+    weather_index = sort_weather(weather)
+    # Many lessons share a weather report and minimums, so remember each verdict
+    verdicts = {}
+
+    # The takeoff times have the time zone of the daycycle file
+    timezone = daycycle.get('timezone', 'UTC')
+    # Lessons often share a takeoff time, so remember whether each one is daytime
+    daytimes = {}
+
+    for lesson, vfr in zip(lessons, filed_vfr):
         # Skip rows that do not have enough columns
         if len(lesson) < 7:
+            yield ''
             continue
 
-        # Extract relevant fields from the lesson row
-        student_id = lesson[0]
-        takeoff_str = lesson[3]
-        filed = lesson[5]
-        area = lesson[6]
-
-        # Use utils.get_for_id to find the student row by id
-        student_row = utils.get_for_id(student_id, students)
+        # Find the student row by id
+        student_row = student_index.get(lesson[0])
         if student_row is None:
-            continue  # Skip if student not found
+            yield ''  # Skip if student not found
+            continue
 
         # Parse takeoff time as datetime object (with timezone from daycycle)
-        timezone = daycycle.get('timezone', 'UTC')
-        takeoff = utils.str_to_time(takeoff_str, timezone)
+        takeoff = utils.str_to_time(lesson[3], timezone)
+
+        # Get pilot certification at takeoff
+        cert = pilots.get_certification(takeoff, student_row)
+
+        # Extract relevant fields from the lesson row
+        area = lesson[6]
 
         # Determine if an instructor is present (column 2 is instructor id)
         instructed = lesson[2] != ''
 
-        # Use the FILED column to determine VFR/IFR for minimums (not pilot rating)
-        # Normalize for case and whitespace
-        vfr = (filed.strip().upper() == 'VFR')
+        # The FILED column (vfr) determines VFR/IFR for minimums (not pilot rating)
 
         # Determine if the flight is during daytime using daycycle.json
-        daytime = utils.daytime(takeoff, daycycle)
-
-        # Get pilot certification at takeoff
-        cert = pilots.get_certification(takeoff, student_row)
+        daytime = daytimes.get(takeoff)
+        if daytime is None:
+            daytime = utils.daytime(takeoff, daycycle)
+            daytimes[takeoff] = daytime
 
         # Get the minimums for this flight (may return None if no match)
-        mins = pilots.get_minimums(cert, area, instructed, vfr, daytime, minimums)
+        category = (cert, area, instructed, vfr, daytime)
+        if category in category_minimums:
+            mins = category_minimums[category]
+        else:
+            mins = pilots.get_minimums(cert, area, instructed, vfr, daytime, minimums)
+            category_minimums[category] = mins
 
         # Get the weather report at or before takeoff
-        weather_report = get_weather_report(takeoff, weather)
+        weather_report = get_weather_report(takeoff, weather, weather_index)
 
         # Always check for a violation, even if mins is None
-        violation = get_weather_violation(weather_report, mins)
-
-        # If there is a violation, add a copy of the lesson with violation appended
-        if violation is not None and violation != '':
-            violations.append(lesson[:] + [violation])
-
-    return violations
-
+        # (the reports stay in weather, so their ids are stable for this loop)
+        key = (id(weather_report), None if mins is None else tuple(mins))
+        if key in verdicts:
+            violation = verdicts[key]
+        else:
+            violation = get_weather_violation(weather_report, mins)
+            verdicts[key] = violation
+        yield violation if violation is not None else ''